@@ -1,18 +1,32 @@
 import os
 import uuid
-import zipfile
 import json
 import sys
+import shutil
+import hashlib
 import argparse
+import threading
 from flask import Flask, render_template, request, jsonify, send_from_directory, send_file
 from werkzeug.utils import secure_filename
-import utils
-from PIL import Image
 
 def resource_path(relative: str) -> str:
     base_path = getattr(sys, '_MEIPASS', os.path.abspath('.'))
     return os.path.join(base_path, relative)
 
+_utils = None
+_utils_lock = threading.Lock()
+
+def load_utils():
+    # Pillow/piexif are only imported once a request touches an image; the lock
+    # makes the background warm-up and request threads share a single import
+    global _utils
+    if _utils is None:
+        with _utils_lock:
+            if _utils is None:
+                import utils
+                _utils = utils
+    return _utils
+
 app = Flask(__name__)
 
 # Parse command line arguments
@@ -27,21 +41,147 @@ BASE_DIR = os.path.abspath(args.data_dir)
 app.config['UPLOAD_FOLDER'] = os.path.join(BASE_DIR, 'uploads')
 app.config['PROCESSED_FOLDER'] = os.path.join(BASE_DIR, 'processed')
 app.config['THUMBNAIL_FOLDER'] = os.path.join(BASE_DIR, 'static', 'thumbnails')
+app.config['BLOB_FOLDER'] = os.path.join(BASE_DIR, 'blobs')  # content-addressed upload store
 app.config['PRESETS_FOLDER'] = resource_path('presets')
 app.config['WEB_FOLDER'] = resource_path('web')
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max upload
 
-# Ensure directories exist
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
-os.makedirs(app.config['THUMBNAIL_FOLDER'], exist_ok=True)
-os.makedirs(app.config['PRESETS_FOLDER'], exist_ok=True)
+_dirs_ready = False
+
+def ensure_data_dirs():
+    global _dirs_ready
+    if _dirs_ready:
+        return
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['THUMBNAIL_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['BLOB_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['PRESETS_FOLDER'], exist_ok=True)
+    _dirs_ready = True
+
+def warm_up():
+    # Load image libraries in the background so the first upload doesn't pay for it
+    try:
+        load_utils()
+    except Exception as e:
+        print(f"Warm-up failed: {e}")
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'tiff', 'webp'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def store_upload(file, dest_path):
+    """
+    Streams an upload into the blob store while hashing it, then links dest_path
+    to the blob. Identical content is stored once. Returns (sha256, is_duplicate).
+    """
+    blob_dir = app.config['BLOB_FOLDER']
+    tmp_path = os.path.join(blob_dir, f".{uuid.uuid4()}.tmp")
+    digest = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as out:
+            while True:
+                chunk = file.stream.read(1024 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        # Aborted upload or full disk: don't leave orphaned temp files in the blob store
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    sha = digest.hexdigest()
+    blob_path = os.path.join(blob_dir, sha)
+    duplicate = os.path.exists(blob_path)
+    if duplicate:
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, blob_path)
+    try:
+        os.link(blob_path, dest_path)
+    except OSError:
+        # Filesystem without hard links: fall back to a copy
+        shutil.copyfile(blob_path, dest_path)
+    # Remember which blob the upload came from, so later requests can reuse its cached metadata
+    with open(os.path.join(blob_dir, f"{os.path.basename(dest_path)}.ref"), 'w', encoding='utf-8') as f:
+        f.write(sha)
+    return sha, duplicate
+
+def upload_sha(file_path):
+    # Content hash of an upload, as recorded by store_upload
+    ref_path = os.path.join(app.config['BLOB_FOLDER'], f"{os.path.basename(file_path)}.ref")
+    try:
+        with open(ref_path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        pass
+    # Uploads stored before refs were recorded: hash the content instead
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_upload_metadata(sha, file_path):
+    # Parsed metadata is cached per content hash and shared by all duplicate uploads
+    utils = load_utils()
+    meta_path = os.path.join(app.config['BLOB_FOLDER'], f"{sha}.json")
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('rules_version') != utils.aigc_rules_version():
+                # AIGC keywords changed since caching: re-run only the detector and
+                # persist the result so later uploads of this content skip it
+                meta['aigc'] = utils.detect_aigc_from_exif(meta['exif'])
+                meta['rules_version'] = utils.aigc_rules_version()
+                write_upload_metadata(meta_path, meta)
+            return meta
+        except Exception as e:
+            print(f"Metadata cache unreadable: {e}")
+
+    exif_data = utils.get_exif_data(file_path)
+    aigc = utils.detect_aigc_from_exif(exif_data)
+    try:
+        from PIL import Image
+        with Image.open(file_path) as img:
+            width, height = img.size
+            fmt = img.format
+    except:
+        width, height, fmt = None, None, None
+    meta = {
+        'exif': exif_data,
+        'aigc': aigc,
+        'rules_version': utils.aigc_rules_version(),
+        'width': width,
+        'height': height,
+        'format': fmt
+    }
+    write_upload_metadata(meta_path, meta)
+    return meta
+
+def write_upload_metadata(meta_path, meta):
+    try:
+        tmp_path = f"{meta_path}.{uuid.uuid4()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, meta_path)
+    except Exception as e:
+        print(f"Failed to cache metadata: {e}")
+
+def exif_mode(params):
+    # 'compact' (default): summary fields + per-IFD key counts, /process returns a diff;
+    #   everything else via /exif/<id>?path=<ifd>
+    # 'full': complete EXIF dict as before
+    mode = (params or {}).get('exif_mode') or request.args.get('exif_mode') or 'compact'
+    return 'full' if mode == 'full' else 'compact'
+
+@app.before_request
+def prepare_request():
+    ensure_data_dirs()
+
 @app.after_request
 def add_cors_headers(response):
     origin = request.headers.get('Origin', '*')
@@ -56,6 +196,7 @@ def add_cors_headers(response):
 def upload_file():
     if request.method == 'OPTIONS':
         return jsonify({'ok': True}), 200
+    utils = load_utils()
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     file = request.files['file']
@@ -71,44 +212,53 @@ def upload_file():
         os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], save_name)
-        file.save(file_path)
+        sha, duplicate = store_upload(file, file_path)
 
-        # Generate thumbnail
-        thumb_name = f"{file_id}_thumb.{ext}"
+        # Generate thumbnail (shared by every upload with the same content)
+        thumb_name = f"{sha}_thumb.{ext}"
         thumb_path = os.path.join(app.config['THUMBNAIL_FOLDER'], thumb_name)
-        utils.create_thumbnail(file_path, thumb_path)
+        if not os.path.exists(thumb_path):
+            # Render to a private name (keeping the extension Pillow infers the format from)
+            # and swap it in, so concurrent duplicate uploads never serve a half-written file
+            tmp_thumb = os.path.join(app.config['THUMBNAIL_FOLDER'], f".{sha}_thumb.{uuid.uuid4()}.{ext}")
+            if utils.create_thumbnail(file_path, tmp_thumb):
+                os.replace(tmp_thumb, thumb_path)
+            elif os.path.exists(tmp_thumb):
+                os.remove(tmp_thumb)
 
         # Get EXIF data
-        exif_data = utils.get_exif_data(file_path)
-        aigc = utils.detect_aigc_from_exif(exif_data)
-        try:
-            with Image.open(file_path) as img:
-                width, height = img.size
-                fmt = img.format
-        except:
-            width, height, fmt = None, None, None
+        meta = load_upload_metadata(sha, file_path)
+        exif_data = meta['exif']
+        aigc = meta['aigc']
+        width, height, fmt = meta['width'], meta['height'], meta['format']
         try:
             print(f"文件 {filename} AIGC检测: {('是' if aigc['is_aigc'] else '否')}  匹配: {aigc.get('matched')}")
         except:
             pass
 
-        return jsonify({
+        response = {
             'id': file_id,
             'filename': filename,
             'thumbnail_url': f"/static/thumbnails/{thumb_name}",
-            'exif': exif_data,
             'aigc': aigc.get('is_aigc', False),
             'aigc_detail': aigc,
             'width': width,
             'height': height,
-            'format': fmt
-        })
+            'format': fmt,
+            'duplicate': duplicate
+        }
+        if exif_mode(request.form) == 'full':
+            response['exif'] = exif_data
+        else:
+            response['exif'], response['exif_summary'], response['exif_truncated'] = utils.summarize_exif(exif_data)
+        return jsonify(response)
     return jsonify({'error': 'File type not allowed'}), 400
 
 @app.route('/process', methods=['POST', 'OPTIONS'])
 def process_file():
     if request.method == 'OPTIONS':
         return jsonify({'ok': True}), 200
+    utils = load_utils()
     data = request.json
     file_id = data.get('id')
     action = data.get('action') # 'clear', 'import_preset', 'import_custom'
@@ -187,6 +337,7 @@ def process_file():
         new_exif = utils.get_exif_data(output_path)
         new_aigc = utils.detect_aigc_from_exif(new_exif)
         try:
+            from PIL import Image
             with Image.open(output_path) as img:
                 n_width, n_height = img.size
                 n_fmt = img.format
@@ -194,19 +345,147 @@ def process_file():
             n_width, n_height, n_fmt = None, None, None
         
         # Return new filename if changed
-        return jsonify({
+        response = {
             'success': True, 
-            'exif': new_exif,
             'new_filename': output_filename if convert_to_jpg else None,
             'aigc': new_aigc.get('is_aigc', False),
             'aigc_detail': new_aigc,
             'width': n_width,
             'height': n_height,
             'format': n_fmt
-        })
+        }
+        if exif_mode(data) == 'full':
+            response['exif'] = new_exif
+        else:
+            # Send only what changed relative to the uploaded file
+            # The upload's metadata is already cached per content hash; don't re-parse it
+            before = load_upload_metadata(upload_sha(input_path), input_path)['exif']
+            diff = utils.diff_exif(before, new_exif)
+            response['exif_diff'], truncated = utils.compact_exif(diff)
+            # Paths into the rebuilt EXIF, i.e. without the added/changed section
+            response['exif_truncated'] = [path[1:] for path in truncated]
+            _, response['exif_summary'], _ = utils.summarize_exif(new_exif)
+        return jsonify(response)
     else:
         return jsonify({'error': 'Processing failed'}), 500
 
+@app.route('/process_batch', methods=['POST', 'OPTIONS'])
+def process_batch():
+    """
+    Applies a preset/custom template plus per-file overrides to many uploads at once.
+    Overrides come from `items` ([{"id": ..., "exif": {...}}]) or a CSV `manifest`
+    with an `id` column and one column per EXIF tag.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({'ok': True}), 200
+    utils = load_utils()
+    data = request.json or {}
+    convert_to_jpg = data.get('convert_to_jpg', False)
+    clear_aigc = data.get('clear_aigc', False)
+
+    if data.get('preset'):
+        preset_path = os.path.join(app.config['PRESETS_FOLDER'], f"{data['preset']}.json")
+        if not os.path.exists(preset_path):
+            return jsonify({'error': 'Preset not found'}), 404
+        with open(preset_path, 'r', encoding='utf-8') as f:
+            template = json.load(f)
+    else:
+        template = data.get('custom_data') or {}
+
+    if data.get('manifest'):
+        entries = utils.parse_exif_manifest(data['manifest'])
+    else:
+        items = data.get('items', [])
+        if not isinstance(items, list) or not all(
+            isinstance(item, dict) and isinstance(item.get('exif') or {}, dict) for item in items
+        ):
+            return jsonify({'error': 'Invalid items'}), 400
+        entries = [(item.get('id'), item.get('exif') or {}) for item in items if item.get('id')]
+    if not entries:
+        return jsonify({'error': 'No files selected'}), 400
+
+    try:
+        blobs = utils.build_exif_batch(template, [overrides for _, overrides in entries])
+    except Exception as e:
+        print(f"build_exif_batch error: {e}")
+        return jsonify({'error': 'Invalid EXIF data'}), 400
+
+    upload_dir = app.config['UPLOAD_FOLDER']
+    processed_dir = app.config['PROCESSED_FOLDER']
+    uploads = os.listdir(upload_dir)
+    processed = os.listdir(processed_dir)
+    results = []
+    for (file_id, _), exif_bytes in zip(entries, blobs):
+        target_file = next((f for f in uploads if f.startswith(file_id)), None)
+        if not target_file:
+            results.append({'id': file_id, 'success': False, 'error': 'File not found'})
+            continue
+        input_path = os.path.join(upload_dir, target_file)
+        if convert_to_jpg:
+            output_filename = os.path.splitext(target_file)[0] + '.jpg'
+        else:
+            output_filename = target_file
+        output_path = os.path.join(processed_dir, output_filename)
+        for f in processed:
+            if f.startswith(file_id) and f != output_filename:
+                try:
+                    os.remove(os.path.join(processed_dir, f))
+                except:
+                    pass
+
+        if not utils.modify_exif(input_path, output_path, convert_to_jpg=convert_to_jpg, exif_bytes=exif_bytes):
+            results.append({'id': file_id, 'success': False, 'error': 'Processing failed'})
+            continue
+        if clear_aigc:
+            try:
+                if not utils.strip_aigc_metadata(output_path, output_path):
+                    print("Warning: strip_aigc_metadata failed")
+            except Exception as e:
+                print(f"strip_aigc_metadata error: {e}")
+        new_aigc = utils.detect_aigc_from_exif(utils.get_exif_data(output_path))
+        results.append({
+            'id': file_id,
+            'success': True,
+            'new_filename': output_filename if convert_to_jpg else None,
+            'aigc': new_aigc.get('is_aigc', False),
+            'aigc_detail': new_aigc,
+        })
+
+    return jsonify({
+        'success': any(r['success'] for r in results),
+        'results': results
+    })
+
+@app.route('/exif/<file_id>', methods=['GET', 'OPTIONS'])
+def get_exif(file_id):
+    """
+    Lazy EXIF retrieval for compact (summary) responses.
+    ?source=upload|processed selects the file, repeated ?path= selects an IFD or a
+    nested value (e.g. ?path=PNG Info&path=workflow); no path returns everything.
+    """
+    if request.method == 'OPTIONS':
+        return jsonify({'ok': True}), 200
+    utils = load_utils()
+    if request.args.get('source') == 'processed':
+        folder = app.config['PROCESSED_FOLDER']
+    else:
+        folder = app.config['UPLOAD_FOLDER']
+    target_file = None
+    for f in os.listdir(folder):
+        if f.startswith(file_id) and not f.endswith('.zip'):
+            target_file = f
+            break
+    if not target_file:
+        return jsonify({'error': 'File not found'}), 404
+
+    exif_data = utils.get_exif_data(os.path.join(folder, target_file))
+    path = request.args.getlist('path')
+    try:
+        value = utils.get_exif_value(exif_data, path)
+    except (KeyError, IndexError, ValueError):
+        return jsonify({'error': 'EXIF key not found'}), 404
+    return jsonify({'id': file_id, 'path': path, 'value': value})
+
 @app.route('/download/<file_id>', methods=['GET', 'OPTIONS'])
 def download_file(file_id):
     if request.method == 'OPTIONS':
@@ -233,6 +512,7 @@ def download_batch():
     if not file_ids:
         return jsonify({'error': 'No files selected'}), 400
 
+    import zipfile
     zip_filename = f"batch_download_{uuid.uuid4()}.zip"
     zip_path = os.path.join(app.config['PROCESSED_FOLDER'], zip_filename)
     
@@ -257,6 +537,13 @@ def download_batch():
 def serve_thumbnails(filename):
     return send_from_directory(app.config['THUMBNAIL_FOLDER'], filename)
 
+@app.route('/ready', methods=['GET', 'OPTIONS'])
+def ready():
+    # Polled by the desktop shell / dev launcher instead of sleeping
+    if request.method == 'OPTIONS':
+        return jsonify({'ok': True}), 200
+    return jsonify({'status': 'ready', 'port': args.port}), 200
+
 @app.route('/api')
 def api_root():
     return jsonify({'status': 'online', 'message': 'Exif-Rm-Formater API Server', 'version': '1.0.0'}), 200
@@ -278,4 +565,6 @@ def serve_ui_assets(filename):
     return send_from_directory(app.config['WEB_FOLDER'], filename)
 
 if __name__ == '__main__':
+    ensure_data_dirs()
+    threading.Thread(target=warm_up, daemon=True).start()
     app.run(debug=False, port=args.port)
@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def import_profile():
+    """
+    Runs `python -X importtime -c "import app"` and returns
+    (total_us, [(cumulative_us, self_us, module), ...]) for top-level app imports.
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+        except ValueError:
+            pass
+    total = next((cum for cum, _, name in rows if name.strip() == 'app'), 0)
+    return total, rows
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def time_to_ready(timeout=30):
+    """Starts app.py and returns seconds until /ready answers."""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, 'app.py', '--port', str(port), '--data-dir', data_dir],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while time.perf_counter() - start < timeout:
+                try:
+                    with urllib.request.urlopen(f'http://127.0.0.1:{port}/ready', timeout=1):
+                        return time.perf_counter() - start
+                except Exception:
+                    time.sleep(0.01)
+            raise RuntimeError('backend did not become ready')
+        finally:
+            proc.terminate()
+            proc.wait()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backend cold start benchmark')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to show')
+    parser.add_argument('--baseline', help='JSON file with previous results to compare against')
+    parser.add_argument('--save-baseline', help='write results to this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown')
+    args = parser.parse_args(argv)
+
+    import_totals = []
+    rows = []
+    for _ in range(args.runs):
+        total, rows = import_profile()
+        import_totals.append(total / 1e6)
+    ready_times = [time_to_ready() for _ in range(args.runs)]
+
+    results = {
+        'import_s': statistics.median(import_totals),
+        'ready_s': statistics.median(ready_times),
+    }
+    print(f"import app: {results['import_s'] * 1000:.1f} ms (median of {args.runs})")
+    print(f"time to /ready: {results['ready_s'] * 1000:.1f} ms (median of {args.runs})")
+    print("slowest imports (cumulative us | self us | module):")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {cumulative_us:>9} | {self_us:>8} | {name}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressed = False
+        for key, value in results.items():
+            limit = baseline.get(key, 0) * (1 + args.tolerance)
+            if baseline.get(key) and value > limit:
+                print(f"REGRESSION {key}: {value:.3f}s > {limit:.3f}s (baseline {baseline[key]:.3f}s)")
+                regressed = True
+        if regressed:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
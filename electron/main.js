@@ -100,14 +100,15 @@ async function createWindow() {
     },
   });
 
-  const indexPath = path.join(__dirname, '../frontend/out/index.html');
-  mainWindow.loadFile(indexPath);
-  
   // Open external links in default browser
   mainWindow.webContents.setWindowOpenHandler(({ url }) => {
     require('electron').shell.openExternal(url);
     return { action: 'deny' };
   });
+
+  // Load the UI right away; the page polls /ready and shows a startup state
+  const indexPath = path.join(__dirname, '../frontend/out/index.html');
+  mainWindow.loadFile(indexPath);
 }
 
 app.whenReady().then(() => {
@@ -1,10 +1,47 @@
 'use client';
 
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
-import { FileData } from './types';
+import { ExifDiff, FileData } from './types';
 import FileCard from '@/components/FileCard';
 
+// Rebuild the processed EXIF from the uploaded one plus the server-side diff
+function applyExifDiff(base: Record<string, unknown>, diff?: ExifDiff): Record<string, unknown> {
+  const result: Record<string, unknown> = {};
+  for (const ifd in base) {
+    const v = base[ifd];
+    result[ifd] = (v && typeof v === 'object' && !Array.isArray(v)) ? { ...(v as Record<string, unknown>) } : v;
+  }
+  if (!diff) return result;
+  for (const ifd in diff.removed) {
+    const obj = result[ifd] as Record<string, unknown> | undefined;
+    if (!obj) continue;
+    diff.removed[ifd].forEach(k => { delete obj[k]; });
+    if (Object.keys(obj).length === 0) delete result[ifd];
+  }
+  for (const part of [diff.added, diff.changed]) {
+    for (const ifd in part) {
+      result[ifd] = { ...((result[ifd] ?? {}) as Record<string, unknown>), ...part[ifd] };
+    }
+  }
+  return result;
+}
+
+// Truncated paths of the uploaded EXIF that the diff left alone, plus those truncated in the diff
+function mergeExifTruncated(
+  previous: (string | number)[][] | undefined,
+  diff: ExifDiff | undefined,
+  fromDiff: (string | number)[][] | undefined
+): (string | number)[][] | undefined {
+  if (!diff) return fromDiff;
+  const touched = ([ifd, key]: (string | number)[]) => {
+    const k = String(key);
+    return (diff.removed[ifd] ?? []).includes(k) || k in (diff.added[ifd] ?? {}) || k in (diff.changed[ifd] ?? {});
+  };
+  const merged = [...(previous ?? []).filter(p => !touched(p)), ...(fromDiff ?? [])];
+  return merged.length > 0 ? merged : undefined;
+}
+
 export default function Home() {
   const [uploadedFiles, setUploadedFiles] = useState<FileData[]>([]);
   const [processedFiles, setProcessedFiles] = useState<FileData[]>([]);
@@ -14,8 +51,34 @@ export default function Home() {
   const [convertToJpg, setConvertToJpg] = useState(false);
   const [clearAIGC, setClearAIGC] = useState(false);
   const [selectedIds, setSelectedIds] = useState<Set<string>>(new Set());
+  const [backendReady, setBackendReady] = useState(false);
   const apiBase = (typeof window !== 'undefined' && (window as any).env?.API_BASE) || process.env.NEXT_PUBLIC_API_BASE || 'http://localhost:5000';
 
+  // Poll the backend readiness endpoint while it starts up
+  useEffect(() => {
+    let cancelled = false;
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    const poll = () => {
+      fetch(`${apiBase}/ready`)
+        .then(res => {
+          if (cancelled) return;
+          if (res.ok) {
+            setBackendReady(true);
+          } else {
+            timer = setTimeout(poll, 200);
+          }
+        })
+        .catch(() => {
+          if (!cancelled) timer = setTimeout(poll, 200);
+        });
+    };
+    poll();
+    return () => {
+      cancelled = true;
+      if (timer) clearTimeout(timer);
+    };
+  }, [apiBase]);
+
   const handleDragOver = (e: React.DragEvent) => {
     e.preventDefault();
     setIsDragging(true);
@@ -56,6 +119,11 @@ export default function Home() {
   };
  
   const handleFiles = (files: FileList) => {
+    // Check once per drop/selection so a batch doesn't raise one alert per file
+    if (!backendReady) {
+      alert('后端服务启动中，请稍候');
+      return;
+    }
     Array.from(files).forEach(uploadFile);
   };
  
@@ -88,7 +156,9 @@ export default function Home() {
         if (res.success) {
           return {
             ...file,
-            exif: res.exif,
+            exif: res.exif ?? applyExifDiff(file.exif, res.exif_diff),
+            exif_summary: res.exif_summary,
+            exif_truncated: res.exif ? res.exif_truncated : mergeExifTruncated(file.exif_truncated, res.exif_diff, res.exif_truncated),
             filename: res.new_filename || file.filename,
             aigc: res.aigc ?? file.aigc,
             aigc_detail: res.aigc_detail ?? file.aigc_detail,
@@ -172,6 +242,12 @@ export default function Home() {
         <h1 className="text-2xl font-bold text-blue-600 dark:text-blue-500">蓝梅EXIF信息格式化工具</h1>
       </header>
 
+      {!backendReady && (
+        <div className="bg-yellow-50 dark:bg-yellow-900/30 border-b border-yellow-200 dark:border-yellow-800 px-8 py-2 text-sm text-yellow-800 dark:text-yellow-200">
+          后端服务启动中…
+        </div>
+      )}
+
       <motion.main 
         initial={{ opacity: 0, y: 20 }}
         animate={{ opacity: 1, y: 0 }}
@@ -3,6 +3,8 @@ export interface FileData {
   filename: string;
   thumbnail_url: string;
   exif: Record<string, unknown>;
+  exif_truncated?: (string | number)[][];
+  exif_summary?: Record<string, number>;
   aigc?: boolean;
   aigc_detail?: {
     is_aigc: boolean;
@@ -14,9 +16,18 @@ export interface FileData {
   format?: string | null;
 }
 
+export interface ExifDiff {
+  added: Record<string, Record<string, unknown>>;
+  removed: Record<string, string[]>;
+  changed: Record<string, Record<string, unknown>>;
+}
+
 export interface ProcessResponse {
   success: boolean;
-  exif: Record<string, unknown>;
+  exif?: Record<string, unknown>;
+  exif_diff?: ExifDiff;
+  exif_summary?: Record<string, number>;
+  exif_truncated?: (string | number)[][];
   error?: string;
   new_filename?: string | null;
   aigc?: boolean;
@@ -11,6 +11,24 @@ interface FileCardProps {
 export default function FileCard({ file, isProcessed = false, isSelected = false, onToggleSelect }: FileCardProps) {
   const apiBase = (typeof window !== 'undefined' && (window as any).env?.API_BASE) || process.env.NEXT_PUBLIC_API_BASE || 'http://localhost:5000';
   const [showModal, setShowModal] = (typeof window !== 'undefined') ? (require('react').useState as typeof import('react').useState<boolean>)(false) : [false, () => {}];
+  const [fullExif, setFullExif] = (typeof window !== 'undefined') ? (require('react').useState as typeof import('react').useState<Record<string, unknown> | null>)(null) : [null, () => {}];
+  // Drop the fetched metadata when this card is reused for a newer result
+  if (typeof window !== 'undefined') {
+    (require('react').useEffect as typeof import('react').useEffect)(() => {
+      setFullExif(null);
+    }, [file.exif, file.exif_truncated, file.exif_summary]);
+  }
+  const modalExif = fullExif ?? file.exif;
+  const openModal = () => {
+    setShowModal(true);
+    // Compact responses only carry summary fields; fetch the complete metadata on demand
+    if (!fullExif && (file.exif_summary || (file.exif_truncated && file.exif_truncated.length > 0))) {
+      fetch(`${apiBase}/exif/${file.id}?source=${isProcessed ? 'processed' : 'upload'}`)
+        .then(res => res.json())
+        .then(res => { if (res.value) setFullExif(res.value as Record<string, unknown>); })
+        .catch(err => console.error(err));
+    }
+  };
   const formatValue = (val: unknown): string => {
     if (val === null || val === undefined) return '';
     if (typeof val === 'string') return val;
@@ -23,7 +41,12 @@ export default function FileCard({ file, isProcessed = false, isSelected = false
     }
   };
   const formatExif = (exifData: Record<string, unknown>) => {
-    if (!exifData || Object.keys(exifData).length === 0) return "无 EXIF 信息";
+    if (!exifData || Object.keys(exifData).length === 0) {
+      // Compact summaries can be empty while the per-IFD counts show other metadata
+      const hasOther = file.exif_summary && Object.values(file.exif_summary).some(n => n > 0);
+      if (!hasOther) return "无 EXIF 信息";
+      return <div className="text-xs text-gray-500 dark:text-gray-500">EXIF/元数据存在但不包含常用标签</div>;
+    }
 
     const displayKeys = [
       'Make', 'Model', 'LensModel', 'FNumber', 
@@ -96,7 +119,7 @@ export default function FileCard({ file, isProcessed = false, isSelected = false
         bg-white dark:bg-neutral-800 border rounded-lg overflow-hidden shadow-sm hover:shadow-md transition-all flex flex-col h-full relative group
         ${isSelected ? 'border-blue-500 ring-2 ring-blue-500 ring-opacity-50' : 'border-gray-200 dark:border-neutral-700'}
       `}
-      onClick={() => setShowModal(true)}
+      onClick={() => openModal()}
     >
       <div className="h-32 bg-gray-100 dark:bg-neutral-900 relative">
         {typeof file.aigc === 'boolean' && (
@@ -108,7 +131,7 @@ export default function FileCard({ file, isProcessed = false, isSelected = false
         )}
         <button 
           type="button"
-          onClick={(e) => { e.stopPropagation(); setShowModal(true); }}
+          onClick={(e) => { e.stopPropagation(); openModal(); }}
           className="absolute top-8 right-2 text-[10px] px-2 py-0.5 rounded bg-gray-800/70 text-white hover:bg-gray-700"
         >
           详情
@@ -189,9 +212,9 @@ export default function FileCard({ file, isProcessed = false, isSelected = false
                 <div className="space-y-1">
                   {(() => {
                     const flat: Record<string, unknown> = {};
-                    if (file.exif && typeof file.exif === 'object') {
-                      for (const ifd in file.exif) {
-                        const v = (file.exif as Record<string, unknown>)[ifd];
+                    if (modalExif && typeof modalExif === 'object') {
+                      for (const ifd in modalExif) {
+                        const v = (modalExif as Record<string, unknown>)[ifd];
                         if (v && typeof v === 'object') {
                           const obj = v as Record<string, unknown>;
                           for (const key in obj) {
@@ -209,8 +232,8 @@ export default function FileCard({ file, isProcessed = false, isSelected = false
                     ));
                   })()}
                   {(() => {
-                    const pngInfo = (file.exif && (file.exif as Record<string, unknown>)['PNG Info']) as Record<string, unknown> | undefined;
-                    const xmpInfo = (file.exif && (file.exif as Record<string, unknown>)['XMP']) as Record<string, unknown> | undefined;
+                    const pngInfo = (modalExif && (modalExif as Record<string, unknown>)['PNG Info']) as Record<string, unknown> | undefined;
+                    const xmpInfo = (modalExif && (modalExif as Record<string, unknown>)['XMP']) as Record<string, unknown> | undefined;
                     const items: React.ReactNode[] = [];
                     const pickKeys = ['parameters', 'prompt', 'workflow', 'sd-metadata', 'Comment', 'Description', 'Software'];
                     if (pngInfo && typeof pngInfo === 'object') {
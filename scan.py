@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from PIL import Image
+
+import utils
+
+# Same formats the server accepts for upload
+SCAN_EXTENSIONS = {'png', 'jpg', 'jpeg', 'tiff', 'webp'}
+
+# Flush the index this often so an interrupted scan keeps its progress
+COMMIT_EVERY_ROWS = 500
+COMMIT_EVERY_SECONDS = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    rules_version TEXT NOT NULL,
+    is_aigc INTEGER NOT NULL,
+    matched TEXT,
+    source TEXT,
+    error TEXT,
+    scanned_at REAL NOT NULL
+)
+"""
+
+def open_index(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute(SCHEMA)
+    conn.commit()
+    return conn
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+def iter_images(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if '.' in name and name.rsplit('.', 1)[1].lower() in SCAN_EXTENSIONS:
+                yield os.path.abspath(os.path.join(dirpath, name))
+
+def _scan_one(path, known_hash, force):
+    """
+    Worker: hashes the file and, unless the content is unchanged and rules are
+    current, reads its metadata (Image.open does not decode pixels) and runs
+    the AIGC detector.
+    """
+    try:
+        digest = file_sha256(path)
+    except Exception as e:
+        return {'path': path, 'sha256': '', 'unchanged': False, 'error': str(e)}
+    if not force and digest == known_hash:
+        return {'path': path, 'sha256': digest, 'unchanged': True}
+    # get_exif_data swallows errors; open the file first so an unreadable
+    # image is recorded as an error rather than as "not AIGC"
+    try:
+        with Image.open(path) as img:
+            img.format
+    except Exception as e:
+        return {'path': path, 'sha256': digest, 'unchanged': False, 'error': str(e)}
+    exif_data = utils.get_exif_data(path)
+    aigc = utils.detect_aigc_from_exif(exif_data)
+    return {
+        'path': path,
+        'sha256': digest,
+        'unchanged': False,
+        'is_aigc': bool(aigc.get('is_aigc')),
+        'matched': aigc.get('matched'),
+        'source': aigc.get('source'),
+        'error': None,
+    }
+
+def scan_directory(root, db_path, workers=None, prune=True):
+    """
+    Walks root and records an AIGC verdict per image in the SQLite index at db_path.
+    Files whose size/mtime (or, failing that, content hash) and rule version match
+    the index are skipped. Results are committed as they arrive, so an interrupted
+    run resumes where it stopped. Returns counters for the run.
+    """
+    rules_version = utils.aigc_rules_version()
+    conn = open_index(db_path)
+    known = {
+        row[0]: row[1:]
+        for row in conn.execute('SELECT path, size, mtime_ns, sha256, rules_version, error FROM files')
+    }
+    stats = {'scanned': 0, 'skipped': 0, 'aigc': 0, 'errors': 0, 'removed': 0}
+    seen = set()
+    pending = {}
+    max_pending = (workers or os.cpu_count() or 1) * 4
+    uncommitted = 0
+    last_commit = time.monotonic()
+
+    def record(path, size, mtime_ns, res):
+        if res['unchanged']:
+            # Touched but identical content: refresh stat only
+            conn.execute(
+                'UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?',
+                (size, mtime_ns, path)
+            )
+            stats['skipped'] += 1
+            return
+        if res.get('error'):
+            stats['errors'] += 1
+        else:
+            stats['scanned'] += 1
+            if res['is_aigc']:
+                stats['aigc'] += 1
+        conn.execute(
+            'INSERT OR REPLACE INTO files '
+            '(path, size, mtime_ns, sha256, rules_version, is_aigc, matched, source, error, scanned_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (path, size, mtime_ns, res['sha256'], rules_version, int(res.get('is_aigc', False)),
+             res.get('matched'), res.get('source'), res.get('error'), time.time())
+        )
+
+    def drain(return_when):
+        nonlocal uncommitted, last_commit
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            path, size, mtime_ns = pending.pop(future)
+            try:
+                res = future.result()
+            except Exception as e:
+                # Worker crashed (or the pool broke): record it so the file is retried next run
+                res = {'path': path, 'sha256': '', 'unchanged': False, 'error': f'{type(e).__name__}: {e}'}
+            record(path, size, mtime_ns, res)
+            uncommitted += 1
+        if uncommitted >= COMMIT_EVERY_ROWS or time.monotonic() - last_commit >= COMMIT_EVERY_SECONDS:
+            conn.commit()
+            uncommitted = 0
+            last_commit = time.monotonic()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            try:
+                for path in iter_images(root):
+                    seen.add(path)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    prev = known.get(path)
+                    # Files that previously failed are always retried
+                    rules_current = prev is not None and prev[3] == rules_version and prev[4] is None
+                    if rules_current and prev[0] == st.st_size and prev[1] == st.st_mtime_ns:
+                        stats['skipped'] += 1
+                        continue
+                    known_hash = prev[2] if prev else None
+                    future = pool.submit(_scan_one, path, known_hash, not rules_current)
+                    pending[future] = (path, st.st_size, st.st_mtime_ns)
+                    if len(pending) >= max_pending:
+                        drain(FIRST_COMPLETED)
+                while pending:
+                    drain(FIRST_COMPLETED)
+            except BaseException:
+                # Ctrl-C etc.: don't wait for queued work on the way out
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        if prune:
+            # Drop entries for files under root that no longer exist
+            prefix = os.path.join(os.path.abspath(root), '')
+            for path in known:
+                if path.startswith(prefix) and path not in seen:
+                    conn.execute('DELETE FROM files WHERE path = ?', (path,))
+                    stats['removed'] += 1
+    finally:
+        # Keep whatever finished, even if the scan was interrupted
+        conn.commit()
+        conn.close()
+    return stats
+
+def aigc_report(db_path):
+    """Returns (path, matched, source) for every file currently flagged as AIGC."""
+    conn = open_index(db_path)
+    try:
+        return conn.execute(
+            'SELECT path, matched, source FROM files WHERE is_aigc = 1 ORDER BY path'
+        ).fetchall()
+    finally:
+        conn.close()
+
+def error_report(db_path):
+    """Returns (path, error) for every file that could not be read."""
+    conn = open_index(db_path)
+    try:
+        return conn.execute(
+            'SELECT path, error FROM files WHERE error IS NOT NULL ORDER BY path'
+        ).fetchall()
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk AIGC metadata audit')
+    parser.add_argument('root', help='directory to scan')
+    parser.add_argument('--db', default='aigc_index.sqlite', help='SQLite index path')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--report', action='store_true', help='print files flagged as AIGC and files that failed')
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    stats = scan_directory(args.root, args.db, workers=args.workers)
+    print(f"扫描完成 ({time.time() - start:.1f}s): 新检测 {stats['scanned']}  跳过 {stats['skipped']}  "
+          f"AIGC {stats['aigc']}  错误 {stats['errors']}  移除 {stats['removed']}")
+    if args.report:
+        for path, matched, source in aigc_report(args.db):
+            print(f"{path}\t{matched}\t{source}")
+        for path, error in error_report(args.db):
+            print(f"{path}\t读取失败\t{error}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
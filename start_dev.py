@@ -4,6 +4,18 @@ import webbrowser
 import os
 import sys
 import signal
+import urllib.request
+
+def wait_for_url(url, timeout=60, interval=0.2):
+    # 轮询直到服务可访问，替代固定等待
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return True
+        except Exception:
+            time.sleep(interval)
+    return False
 
 def start_dev():
     print("正在启动服务...")
@@ -29,7 +41,10 @@ def start_dev():
 
     # 3. 等待服务启动
     print("等待服务启动...")
-    time.sleep(5)  # 给一些启动时间
+    if not wait_for_url("http://127.0.0.1:5000/ready"):
+        print("后端启动超时")
+    if not wait_for_url("http://localhost:3000"):
+        print("前端启动超时")
 
     # 4. 打开浏览器
     url = "http://localhost:3000"
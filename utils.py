@@ -1,10 +1,27 @@
 import os
+import io
+import csv
 import json
+import hashlib
+import functools
+import mmap
+import struct
 import shutil
 import piexif
 from PIL import Image
 from PIL.PngImagePlugin import PngInfo
 
+def _register_pillow_plugins():
+    # Import the formats we accept up front; Image.open/save then find them in the
+    # registry without Image.init() importing every other plugin
+    for plugin in ("JpegImagePlugin", "PngImagePlugin", "TiffImagePlugin", "WebPImagePlugin"):
+        try:
+            __import__(f"PIL.{plugin}")
+        except ImportError as e:
+            print(f"Pillow plugin {plugin} unavailable: {e}")
+
+_register_pillow_plugins()
+
 __all__ = [
     "get_exif_data",
     "remove_exif",
@@ -12,7 +29,44 @@ __all__ = [
     "create_thumbnail",
     "detect_aigc_from_exif",
     "strip_aigc_metadata",
+    "compact_exif",
+    "summarize_exif",
+    "diff_exif",
+    "get_exif_value",
+    "aigc_rules_version",
+    "build_exif_batch",
+    "parse_exif_manifest",
 ]
+
+# Strings longer than this are truncated in compact API responses
+EXIF_VALUE_LIMIT = 1024
+
+# Fields kept in summary API responses (the ones the file card renders);
+# everything else is fetched per IFD on demand
+EXIF_SUMMARY_KEYS = {
+    "0th": ["Make", "Model", "Software", "ImageDescription"],
+    "Exif": ["LensModel", "FNumber", "ExposureTime", "ISOSpeedRatings",
+             "DateTimeOriginal", "FocalLength", "UserComment"],
+    "PNG Info": ["parameters", "prompt", "workflow", "sd-metadata", "Comment", "Description", "Software"],
+    # XMP is a nested tree: these leaf names, plus any value the AIGC detector would match
+    "XMP": ["CreatorTool", "DigitalSourceType", "Credit"],
+}
+
+# Keywords used to detect (and strip) AIGC metadata
+AIGC_KEYWORDS = [
+    "ai generated", "ai-generated", "aigc", "midjourney", "stable diffusion",
+    "comfyui", "dall-e", "dalle", "firefly", "novelai", "runway", "ideogram",
+    "leonardo", "generated by", "sdxl", "flux", "controlnet", "lora"
+]
+AIGC_CN_KEYWORDS = ["ai生成", "由ai生成", "aigc生成", "人工智能生成"]
+
+def aigc_rules_version():
+    """
+    Returns a short fingerprint of the AIGC keyword lists.
+    Changes whenever the detection rules change, so stored verdicts can be invalidated.
+    """
+    rules = json.dumps([AIGC_KEYWORDS, AIGC_CN_KEYWORDS], ensure_ascii=False)
+    return hashlib.sha1(rules.encode("utf-8")).hexdigest()[:12]
 def get_exif_data(image_path):
     """
     Extracts EXIF data from an image and returns a readable dictionary.
@@ -118,6 +172,14 @@ def remove_exif(image_path, output_path):
                 print(f"piexif remove failed: {e}, falling back to PIL")
                 # Fallback to PIL if piexif fails
         
+        if _is_tiff(image_path):
+            # Lossless removal for TIFF: rewrite IFDs only
+            try:
+                _remove_exif_tiff(image_path, output_path)
+                return True
+            except Exception as e:
+                print(f"TIFF IFD rewrite failed: {e}, falling back to PIL")
+
         # Fallback / Non-JPEG handling (lossless where possible)
         with Image.open(image_path) as img:
             fmt = (img.format or "").upper()
@@ -137,73 +199,87 @@ def remove_exif(image_path, output_path):
         print(f"Error removing EXIF: {e}")
         return False
 
-def modify_exif(image_path, output_path, exif_json_path=None, preset_data=None, convert_to_jpg=False):
+def _convert_exif_value(tag_type, value):
+    # Helper to convert list to tuple recursively
+    def to_tuple(val):
+        if isinstance(val, list):
+            return tuple(to_tuple(i) for i in val)
+        return val
+
+    if tag_type == 2:  # Ascii
+        if isinstance(value, str):
+            return value.encode('utf-8')
+    elif tag_type in (5, 10):  # Rational, SRational
+        # Single Rational: [1, 2] -> (1, 2)
+        # Array of Rationals: [[1,1], [2,1]] -> ((1,1), (2,1))
+        return to_tuple(value)
+    elif tag_type == 7: # Undefined
+        if isinstance(value, str):
+            return value.encode('utf-8')
+    
+    return value
+
+@functools.lru_cache(maxsize=None)
+def _exif_tag_index(ifd_name):
+    # (name -> tag id, tag id -> type) for one IFD, built once
+    name_to_id = {info["name"]: tag for tag, info in piexif.TAGS[ifd_name].items()}
+    tag_types = {tag: info.get("type") for tag, info in piexif.TAGS[ifd_name].items()}
+    return name_to_id, tag_types
+
+def _map_exif_keys(ifd_name, data_dict):
+    mapped = {}
+    if ifd_name not in piexif.TAGS:
+        return {}
+    
+    name_to_id, tag_types = _exif_tag_index(ifd_name)
+    
+    for k, v in data_dict.items():
+        if k in name_to_id:
+            tag_id = name_to_id[k]
+            tag_type = tag_types.get(tag_id)
+            
+            try:
+                converted_v = _convert_exif_value(tag_type, v)
+                mapped[tag_id] = converted_v
+            except Exception as conv_e:
+                print(f"Warning: Failed to convert tag {k}: {conv_e}")
+                mapped[tag_id] = v
+    return mapped
+
+def _build_exif_dict(target_exif):
     """
-    Modifies EXIF data of an image using a JSON file or preset data.
+    Converts a name-keyed EXIF JSON (presets / custom data) into a piexif dictionary.
+    """
+    exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+    if "0th" in target_exif:
+        exif_dict["0th"] = _map_exif_keys("0th", target_exif["0th"])
+    if "Exif" in target_exif:
+        exif_dict["Exif"] = _map_exif_keys("Exif", target_exif["Exif"])
+    if "GPS" in target_exif:
+        exif_dict["GPS"] = _map_exif_keys("GPS", target_exif["GPS"])
+    return exif_dict
+
+def modify_exif(image_path, output_path, exif_json_path=None, preset_data=None, convert_to_jpg=False, exif_bytes=None):
+    """
+    Modifies EXIF data of an image using a JSON file, preset data, or a prebuilt
+    EXIF blob (e.g. from build_exif_batch).
     Attempts to be lossless for JPEG unless convert_to_jpg is True.
     """
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        if exif_json_path:
-            with open(exif_json_path, 'r', encoding='utf-8') as f:
-                target_exif = json.load(f)
-        elif preset_data:
-            target_exif = preset_data
-        else:
-            return False
-
-        # Construct piexif compatible dictionary
-        exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
-        
-        def convert_value(tag_type, value):
-            # Helper to convert list to tuple recursively
-            def to_tuple(val):
-                if isinstance(val, list):
-                    return tuple(to_tuple(i) for i in val)
-                return val
-
-            if tag_type == 2:  # Ascii
-                if isinstance(value, str):
-                    return value.encode('utf-8')
-            elif tag_type in (5, 10):  # Rational, SRational
-                # Single Rational: [1, 2] -> (1, 2)
-                # Array of Rationals: [[1,1], [2,1]] -> ((1,1), (2,1))
-                return to_tuple(value)
-            elif tag_type == 7: # Undefined
-                if isinstance(value, str):
-                    return value.encode('utf-8')
-            
-            return value
+        exif_dict = None
+        if not exif_bytes:
+            if exif_json_path:
+                with open(exif_json_path, 'r', encoding='utf-8') as f:
+                    target_exif = json.load(f)
+            elif preset_data:
+                target_exif = preset_data
+            else:
+                return False
 
-        def map_keys_to_id(ifd_name, data_dict):
-            mapped = {}
-            if ifd_name not in piexif.TAGS:
-                return {}
-            
-            name_to_id = {info["name"]: tag for tag, info in piexif.TAGS[ifd_name].items()}
-            tag_types = {tag: info.get("type") for tag, info in piexif.TAGS[ifd_name].items()}
-            
-            for k, v in data_dict.items():
-                if k in name_to_id:
-                    tag_id = name_to_id[k]
-                    tag_type = tag_types.get(tag_id)
-                    
-                    try:
-                        converted_v = convert_value(tag_type, v)
-                        mapped[tag_id] = converted_v
-                    except Exception as conv_e:
-                        print(f"Warning: Failed to convert tag {k}: {conv_e}")
-                        mapped[tag_id] = v
-            return mapped
-
-        if "0th" in target_exif:
-            exif_dict["0th"] = map_keys_to_id("0th", target_exif["0th"])
-        if "Exif" in target_exif:
-            exif_dict["Exif"] = map_keys_to_id("Exif", target_exif["Exif"])
-        if "GPS" in target_exif:
-                exif_dict["GPS"] = map_keys_to_id("GPS", target_exif["GPS"])
-                
-        exif_bytes = piexif.dump(exif_dict)
+            # Construct piexif compatible dictionary
+            exif_dict = _build_exif_dict(target_exif)
+            exif_bytes = piexif.dump(exif_dict)
         
         # Check format
         is_jpeg = False
@@ -224,6 +300,13 @@ def modify_exif(image_path, output_path, exif_json_path=None, preset_data=None,
             shutil.copy(image_path, output_path)
             piexif.insert(exif_bytes, output_path)
         else:
+            if _is_tiff(image_path):
+                # Lossless insert for TIFF: rewrite IFDs only
+                try:
+                    _modify_exif_tiff(image_path, output_path, exif_dict or piexif.load(exif_bytes))
+                    return True
+                except Exception as e:
+                    print(f"TIFF IFD rewrite failed: {e}, falling back to PIL")
             # Re-save for others
             with Image.open(image_path) as img:
                 img.save(output_path, exif=exif_bytes, quality=100, subsampling=0)
@@ -249,13 +332,8 @@ def create_thumbnail(image_path, output_path, size=(200, 200)):
 
 def detect_aigc_from_exif(exif_data):
     try:
-        keywords = [
-            "ai generated", "ai-generated", "aigc", "midjourney", "stable diffusion",
-            "comfyui", "dall-e", "dalle", "firefly", "novelai", "runway", "ideogram",
-            "leonardo", "generated by", "sdxl", "flux", "controlnet", "lora"
-        ]
-        
-        cn_keys = ["ai生成", "由ai生成", "aigc生成", "人工智能生成"]
+        keywords = AIGC_KEYWORDS
+        cn_keys = AIGC_CN_KEYWORDS
 
         found_match = None
         
@@ -330,8 +408,127 @@ def detect_aigc_from_exif(exif_data):
         print(f"Error in AIGC detection: {e}")
         return {"is_aigc": False, "matched": None, "source": None}
 
+def compact_exif(exif_data, max_len=EXIF_VALUE_LIMIT):
+    """
+    Returns a copy of exif_data with oversized string values truncated,
+    plus the list of key paths that were truncated (for on-demand retrieval).
+    """
+    truncated = []
+
+    def walk(value, path):
+        if isinstance(value, dict):
+            return {k: walk(v, path + [k]) for k, v in value.items()}
+        if isinstance(value, list):
+            return [walk(v, path + [i]) for i, v in enumerate(value)]
+        if isinstance(value, str) and len(value) > max_len:
+            truncated.append(path)
+            return value[:max_len] + "…"
+        return value
+
+    try:
+        return walk(exif_data or {}, []), truncated
+    except Exception as e:
+        print(f"Error compacting EXIF: {e}")
+        return exif_data, []
+
+def summarize_exif(exif_data, max_len=EXIF_VALUE_LIMIT):
+    """
+    Returns (summary, counts, truncated): only the EXIF_SUMMARY_KEYS fields and
+    AIGC-matching XMP values (long values truncated), the number of keys in every IFD/section, and the key paths
+    that were truncated. The rest is available per IFD via get_exif_value.
+    """
+    exif_data = exif_data or {}
+    summary = {}
+    counts = {}
+    for ifd, values in exif_data.items():
+        counts[ifd] = len(values) if isinstance(values, (dict, list)) else 1
+        if ifd == "XMP":
+            picked = _summarize_xmp(values)
+        elif ifd in EXIF_SUMMARY_KEYS and isinstance(values, dict):
+            picked = {k: values[k] for k in EXIF_SUMMARY_KEYS[ifd] if k in values}
+        else:
+            picked = None
+        if picked:
+            summary[ifd] = picked
+    summary, truncated = compact_exif(summary, max_len)
+    return summary, counts, truncated
+
+def _summarize_xmp(value, key=None):
+    # Pruned copy of the XMP tree keeping summary tags and AIGC matches. Lists are kept
+    # whole so that index paths still resolve against the full metadata.
+    if isinstance(value, dict):
+        picked = {}
+        for k, v in value.items():
+            sub = _summarize_xmp(v, k)
+            if sub is not None:
+                picked[k] = sub
+        return picked or None
+    if isinstance(value, list):
+        return value if any(_summarize_xmp(v, key) is not None for v in value) else None
+    if key in EXIF_SUMMARY_KEYS["XMP"] or _is_aigc_text(value):
+        return value
+    return None
+
+def diff_exif(before, after):
+    """
+    Compares two readable EXIF dicts at IFD/key level.
+    Returns {"added": {ifd: {key: value}}, "removed": {ifd: [key]}, "changed": {ifd: {key: value}}}
+    where values are taken from `after`.
+    """
+    diff = {"added": {}, "removed": {}, "changed": {}}
+    before = before or {}
+    after = after or {}
+    for ifd in set(before) | set(after):
+        old = before.get(ifd, {})
+        new = after.get(ifd, {})
+        if not isinstance(old, dict):
+            old = {}
+        if not isinstance(new, dict):
+            new = {}
+        for k, v in new.items():
+            if k not in old:
+                diff["added"].setdefault(ifd, {})[k] = v
+            elif old[k] != v:
+                diff["changed"].setdefault(ifd, {})[k] = v
+        for k in old:
+            if k not in new:
+                diff["removed"].setdefault(ifd, []).append(k)
+    return diff
+
+def get_exif_value(exif_data, path):
+    """
+    Looks up a value in a readable EXIF dict by key path, e.g. ["PNG Info", "workflow"].
+    Raises KeyError if the path does not exist.
+    """
+    value = exif_data
+    for key in path:
+        if isinstance(value, list):
+            value = value[int(key)]
+        elif isinstance(value, dict):
+            value = value[key]
+        else:
+            raise KeyError(key)
+    return value
+
+def _is_aigc_text(val):
+    if not isinstance(val, (bytes, str)):
+        return False
+    try:
+        text = val.decode("utf-8", errors="ignore") if isinstance(val, bytes) else str(val)
+    except:
+        text = str(val)
+    lower = text.lower()
+    return any(k in lower for k in AIGC_KEYWORDS) or any(k in lower for k in AIGC_CN_KEYWORDS)
+
 def strip_aigc_metadata(image_path, output_path):
     try:
+        if _is_tiff(image_path):
+            # Lossless: drop XMP / AIGC tags at IFD level, keep pixel data as-is
+            try:
+                _strip_aigc_tiff(image_path, output_path)
+                return True
+            except Exception as e:
+                print(f"TIFF IFD rewrite failed: {e}, falling back to PIL")
         with Image.open(image_path) as img:
             exif_bytes = img.info.get("exif")
             filtered_exif_bytes = None
@@ -349,24 +546,9 @@ def strip_aigc_metadata(image_path, output_path):
                     if "0th" in exif_dict:
                         zero_ifd = exif_dict["0th"]
                         name_to_id_0th = {info["name"]: tag for tag, info in piexif.TAGS["0th"].items()}
-                        def is_aigc_text(val):
-                            if not isinstance(val, (bytes, str)):
-                                return False
-                            try:
-                                text = val.decode("utf-8", errors="ignore") if isinstance(val, bytes) else str(val)
-                            except:
-                                text = str(val)
-                            lower = text.lower()
-                            keys = [
-                                "ai generated", "ai-generated", "aigc", "midjourney", "stable diffusion",
-                                "comfyui", "dall-e", "dalle", "firefly", "novelai", "runway", "ideogram",
-                                "leonardo", "generated by", "sdxl", "flux", "controlnet", "lora"
-                            ]
-                            cn = ["ai生成", "由ai生成", "aigc生成", "人工智能生成"]
-                            return any(k in lower for k in keys) or any(k in lower for k in cn)
                         for field in ["ImageDescription", "Software"]:
                             tag_id = name_to_id_0th.get(field)
-                            if tag_id in zero_ifd and is_aigc_text(zero_ifd[tag_id]):
+                            if tag_id in zero_ifd and _is_aigc_text(zero_ifd[tag_id]):
                                 zero_ifd.pop(tag_id, None)
                     filtered_exif_bytes = piexif.dump(exif_dict)
                 except Exception as e:
@@ -418,53 +600,514 @@ def strip_aigc_metadata(image_path, output_path):
         print(f"Error stripping AIGC metadata: {e}")
         return False
 
+
+def _copy_file_range(src, dst, offset, count):
+    # Copy count bytes starting at offset from src to the current position of dst,
+    # letting the kernel move the data where possible
+    src_fd = src.fileno()
+    dst_fd = dst.fileno()
+    if hasattr(os, "copy_file_range"):
+        try:
+            while count > 0:
+                sent = os.copy_file_range(src_fd, dst_fd, count, offset)
+                if sent == 0:
+                    break
+                offset += sent
+                count -= sent
+            return
+        except OSError:
+            pass
+    if hasattr(os, "sendfile"):
+        try:
+            while count > 0:
+                sent = os.sendfile(dst_fd, src_fd, offset, count)
+                if sent == 0:
+                    break
+                offset += sent
+                count -= sent
+            return
+        except OSError:
+            pass
+    # Portable fallback: chunked copy through a small buffer
+    src.seek(offset)
+    while count > 0:
+        chunk = src.read(min(count, 1024 * 1024))
+        if not chunk:
+            break
+        dst.write(chunk)
+        count -= len(chunk)
+
 def _strip_jpeg_xmp_inplace(jpeg_path):
-    # Remove APP1 XMP segments without re-encoding
-    with open(jpeg_path, "rb") as f:
-        data = f.read()
-    if not data.startswith(b"\xFF\xD8"):
-        return
-    i = 2
-    out = bytearray(b"\xFF\xD8")
+    # Remove APP1 XMP segments without re-encoding.
+    # Only the header segments before SOS are scanned (via mmap); the
+    # entropy-coded payload is copied file-to-file without Python buffers.
     xmp_sig = b"http://ns.adobe.com/xap/1.0/\x00"
-    sos_found = False
-    while i < len(data):
-        if data[i] != 0xFF:
-            # Not a marker; corrupt?
-            out.extend(data[i:])
-            break
-        # Skip fill bytes 0xFF
-        while i < len(data) and data[i] == 0xFF:
-            i += 1
-        if i >= len(data):
-            break
-        marker = data[i]
-        i += 1
-        out.append(0xFF)
-        out.append(marker)
-        if marker == 0xDA:  # SOS
-            sos_found = True
-            out.extend(data[i:])  # copy rest (entropy-coded)
-            break
-        # Read segment length
-        if i + 1 >= len(data):
-            break
-        seg_len = (data[i] << 8) | data[i + 1]
-        seg_start = i + 2
-        seg_end = seg_start + seg_len - 2
-        if seg_end > len(data):
-            break
-        seg_payload = data[seg_start:seg_end]
-        # If APP1 and payload starts with XMP signature, skip
-        if marker == 0xE1 and seg_payload.startswith(xmp_sig):
-            # Skip writing this segment
-            i = seg_end
+    with open(jpeg_path, "rb") as src:
+        size = os.fstat(src.fileno()).st_size
+        if size < 4:
+            return
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                if view[0:2] != b"\xFF\xD8":
+                    return
+                i = 2
+                keep = []  # (start, end) ranges of header segments to retain
+                dropped = False
+                sos_offset = None
+                while i < size:
+                    if view[i] != 0xFF:
+                        # Not a marker; corrupt?
+                        break
+                    seg_start = i
+                    # Skip fill bytes 0xFF
+                    while i < size and view[i] == 0xFF:
+                        i += 1
+                    if i >= size:
+                        break
+                    marker = view[i]
+                    i += 1
+                    if marker == 0xDA:  # SOS
+                        sos_offset = seg_start
+                        break
+                    # Read segment length
+                    if i + 1 >= size:
+                        break
+                    seg_len = (view[i] << 8) | view[i + 1]
+                    seg_end = i + seg_len
+                    if seg_end > size:
+                        break
+                    # If APP1 and payload starts with XMP signature, skip
+                    if marker == 0xE1 and view[i + 2:i + 2 + len(xmp_sig)] == xmp_sig:
+                        dropped = True
+                    else:
+                        keep.append((seg_start, seg_end))
+                    i = seg_end
+                if sos_offset is None or not dropped:
+                    return
+                header = bytearray(b"\xFF\xD8")
+                for start, end in keep:
+                    header += view[start:end]
+            finally:
+                view.release()
+        tmp_path = jpeg_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as dst:
+                dst.write(header)
+                dst.flush()
+                _copy_file_range(src, dst, sos_offset, size - sos_offset)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    # Replace only after the source handle is closed (required on Windows)
+    os.replace(tmp_path, jpeg_path)
+
+# --- TIFF IFD-level editing -------------------------------------------------
+# Rewrites only the IFDs of a (classic, non-Big) TIFF and copies strip/tile data
+# byte-for-byte, so metadata edits never re-encode or drop pages.
+
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4}
+_TIFF_TYPE_FORMATS = {1: "B", 3: "H", 4: "L", 6: "b", 8: "h", 9: "l", 11: "f", 12: "d", 13: "L"}
+# Pointer tags whose target IFD is parsed and re-serialized with the page
+_TIFF_SUB_IFD_TAGS = {34665: "Exif", 34853: "GPS", 40965: "Interop"}
+# Tags holding offsets we don't relocate; files using them go through Pillow
+_TIFF_UNSUPPORTED_TAGS = {288, 289, 330, 513, 514}
+_TIFF_DATA_TAGS = ((273, 279), (324, 325))  # (offsets, byte counts): strips, tiles
+# IFD0 tags treated as EXIF-style metadata (removed by remove_exif / replaced by modify_exif)
+_TIFF_EXIF_TAGS = {270, 271, 272, 305, 306, 315, 316, 33432, 34665, 34853}
+# Embedded metadata blocks: XMP, IPTC, Photoshop
+_TIFF_BLOCK_TAGS = {700, 33723, 34377}
+
+def _read_tiff_ifd(f, offset, endian, size):
+    f.seek(offset)
+    (count,) = struct.unpack(endian + "H", f.read(2))
+    raw_entries = f.read(12 * count)
+    (next_offset,) = struct.unpack(endian + "L", f.read(4))
+    ifd = {}
+    for n in range(count):
+        tag, typ, cnt, value = struct.unpack(endian + "HHL4s", raw_entries[n * 12:(n + 1) * 12])
+        if typ not in _TIFF_TYPE_SIZES:
+            raise ValueError(f"unknown TIFF type {typ} for tag {tag}")
+        length = _TIFF_TYPE_SIZES[typ] * cnt
+        if length > 4:
+            (value_offset,) = struct.unpack(endian + "L", value)
+            if value_offset + length > size:
+                raise ValueError(f"TIFF tag {tag} points outside the file")
+            f.seek(value_offset)
+            value = f.read(length)
+        else:
+            value = value[:length]
+        if tag in _TIFF_SUB_IFD_TAGS:
+            (sub_offset,) = struct.unpack(endian + "L", value[:4])
+            value = _read_tiff_ifd(f, sub_offset, endian, size)[0]
+        ifd[tag] = (typ, cnt, value)
+    return ifd, next_offset
+
+def _read_tiff(f):
+    """
+    Parses a classic TIFF into (endian, [ifd, ...]), one IFD per page.
+    Each IFD maps tag -> (type, count, raw value bytes); sub-IFDs are nested dicts.
+    """
+    size = os.fstat(f.fileno()).st_size
+    f.seek(0)
+    header = f.read(8)
+    if header[:2] == b"II":
+        endian = "<"
+    elif header[:2] == b"MM":
+        endian = ">"
+    else:
+        raise ValueError("not a TIFF file")
+    magic, offset = struct.unpack(endian + "HL", header[2:8])
+    if magic != 42:
+        raise ValueError("BigTIFF / unknown TIFF variant")
+    pages = []
+    seen = set()
+    while offset and offset not in seen:
+        seen.add(offset)
+        ifd, offset = _read_tiff_ifd(f, offset, endian, size)
+        if _TIFF_UNSUPPORTED_TAGS & set(ifd):
+            raise ValueError("TIFF uses offset tags that can't be relocated")
+        pages.append(ifd)
+    return endian, pages
+
+def _tiff_values(entry, endian):
+    typ, cnt, value = entry
+    return struct.unpack(endian + _TIFF_TYPE_FORMATS[typ] * cnt, value)
+
+def _encode_tiff_value(tag_type, value, endian):
+    # Encodes a piexif-style value as (type, count, raw bytes)
+    if tag_type in (1, 7) and isinstance(value, (bytes, bytearray)):
+        return tag_type, len(value), bytes(value)
+    if tag_type == 2:
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        value = bytes(value)
+        if not value.endswith(b"\x00"):
+            value += b"\x00"
+        return 2, len(value), value
+    if tag_type in (5, 10):
+        pairs = value if value and isinstance(value[0], (tuple, list)) else (value,)
+        fmt = "L" if tag_type == 5 else "l"
+        raw = b"".join(struct.pack(endian + fmt * 2, num, den) for num, den in pairs)
+        return tag_type, len(pairs), raw
+    if tag_type == 7:
+        tag_type = 1
+    items = value if isinstance(value, (tuple, list)) else (value,)
+    return tag_type, len(items), struct.pack(endian + _TIFF_TYPE_FORMATS[tag_type] * len(items), *items)
+
+def _tiff_ifd_from_exif(ifd_name, tags, endian):
+    # Builds an IFD dict from a piexif {tag_id: value} mapping
+    ifd = {}
+    for tag_id, value in tags.items():
+        info = piexif.TAGS.get(ifd_name, {}).get(tag_id)
+        if not info or value is None:
+            continue
+        try:
+            ifd[tag_id] = _encode_tiff_value(info["type"], value, endian)
+        except Exception as e:
+            print(f"Warning: Failed to encode TIFF tag {info['name']}: {e}")
+    return ifd
+
+def _serialize_tiff_ifd(ifd, base, endian):
+    """
+    Serializes ifd (and its sub-IFDs) to bytes placed at file offset base.
+    Returns (bytes, position of the next-IFD pointer relative to base).
+    """
+    # Sub-IFDs emptied by an edit are dropped together with their pointer tag
+    tags = sorted(t for t, entry in ifd.items() if not (isinstance(entry[2], dict) and not entry[2]))
+    table_len = 2 + 12 * len(tags) + 4
+    entries = []
+    extra = bytearray()
+
+    def data_offset():
+        return base + table_len + len(extra)
+
+    for tag in tags:
+        typ, cnt, value = ifd[tag]
+        if isinstance(value, dict):
+            if len(extra) % 2:
+                extra += b"\x00"
+            sub_bytes, _ = _serialize_tiff_ifd(value, data_offset(), endian)
+            entries.append(struct.pack(endian + "HHLL", tag, 4, 1, data_offset()))
+            extra += sub_bytes
+        elif len(value) > 4:
+            if len(extra) % 2:
+                extra += b"\x00"
+            entries.append(struct.pack(endian + "HHLL", tag, typ, cnt, data_offset()))
+            extra += value
+        else:
+            entries.append(struct.pack(endian + "HHL", tag, typ, cnt) + value.ljust(4, b"\x00"))
+    table = struct.pack(endian + "H", len(entries)) + b"".join(entries) + b"\x00\x00\x00\x00"
+    return table + bytes(extra), table_len - 4
+
+def _rewrite_tiff(image_path, output_path, edit):
+    """
+    Rewrites a TIFF calling edit(page_index, ifd, endian) on each page's IFD dict.
+    Strip/tile data is copied unchanged; only IFDs and tag values are rewritten.
+    Raises ValueError for layouts this writer can't relocate safely.
+    """
+    tmp_path = output_path + ".tmp"
+    with open(image_path, "rb") as src:
+        endian, pages = _read_tiff(src)
+        try:
+            with open(tmp_path, "wb", buffering=0) as dst:
+                dst.write((b"II" if endian == "<" else b"MM") + struct.pack(endian + "HL", 42, 0))
+                prev_pointer = 4
+                for index, ifd in enumerate(pages):
+                    edit(index, ifd, endian)
+                    for offsets_tag, counts_tag in _TIFF_DATA_TAGS:
+                        if offsets_tag not in ifd:
+                            continue
+                        offsets = _tiff_values(ifd[offsets_tag], endian)
+                        counts = _tiff_values(ifd[counts_tag], endian)
+                        new_offsets = []
+                        for offset, count in zip(offsets, counts):
+                            new_offsets.append(dst.tell())
+                            _copy_file_range(src, dst, offset, count)
+                        ifd[offsets_tag] = (4, len(new_offsets),
+                                            struct.pack(endian + "L" * len(new_offsets), *new_offsets))
+                    if dst.tell() % 2:
+                        dst.write(b"\x00")
+                    base = dst.tell()
+                    block, next_pointer = _serialize_tiff_ifd(ifd, base, endian)
+                    dst.write(block)
+                    # Link this page from the header / previous page
+                    dst.seek(prev_pointer)
+                    dst.write(struct.pack(endian + "L", base))
+                    dst.seek(0, os.SEEK_END)
+                    prev_pointer = base + next_pointer
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, output_path)
+
+def _is_tiff(image_path):
+    try:
+        with open(image_path, "rb") as f:
+            return f.read(4) in (b"II*\x00", b"MM\x00*")
+    except OSError:
+        return False
+
+def _remove_exif_tiff(image_path, output_path):
+    def edit(index, ifd, endian):
+        for tag in _TIFF_EXIF_TAGS | _TIFF_BLOCK_TAGS:
+            ifd.pop(tag, None)
+    _rewrite_tiff(image_path, output_path, edit)
+
+def _modify_exif_tiff(image_path, output_path, exif_dict):
+    def edit(index, ifd, endian):
+        if index != 0:
+            return
+        # Replace existing EXIF-style tags, like piexif.insert does for JPEG
+        for tag in _TIFF_EXIF_TAGS:
+            ifd.pop(tag, None)
+        for tag, entry in _tiff_ifd_from_exif("0th", exif_dict.get("0th", {}), endian).items():
+            # Never let a preset override the image structure (size, strips, ...)
+            if tag not in ifd and tag not in _TIFF_SUB_IFD_TAGS:
+                ifd[tag] = entry
+        for ifd_name, pointer_tag in (("Exif", 34665), ("GPS", 34853)):
+            sub_ifd = _tiff_ifd_from_exif(ifd_name, exif_dict.get(ifd_name, {}), endian)
+            for tag in _TIFF_SUB_IFD_TAGS:
+                sub_ifd.pop(tag, None)
+            if sub_ifd:
+                ifd[pointer_tag] = (4, 1, sub_ifd)
+    _rewrite_tiff(image_path, output_path, edit)
+
+def _strip_aigc_tiff(image_path, output_path):
+    def edit(index, ifd, endian):
+        ifd.pop(700, None)  # XMP
+        for tag in (270, 305):  # ImageDescription, Software
+            if tag in ifd and _is_aigc_text(ifd[tag][2]):
+                ifd.pop(tag)
+        exif_entry = ifd.get(34665)
+        if exif_entry:
+            exif_entry[2].pop(37510, None)  # UserComment
+    _rewrite_tiff(image_path, output_path, edit)
+
+# --- Batch EXIF encoding ----------------------------------------------------
+# For many files sharing a template with a few per-file fields, the EXIF blob
+# is laid out once with fixed-size slots for the variable fields; each file
+# then only patches its values into a copy of that byte template.
+
+_EXIF_IFD_POINTERS = {"Exif": 34665, "GPS": 34853}
+
+def _resolve_exif_name(name):
+    # Flat manifest column -> (ifd, name); "GPS.GPSLatitude" style is also accepted
+    if "." in name:
+        ifd_name, tag_name = name.split(".", 1)
+        return ifd_name, tag_name
+    for ifd_name in ("0th", "Exif", "GPS"):
+        if name in _exif_tag_index(ifd_name)[0]:
+            return ifd_name, name
+    return None, name
+
+def _nest_exif_overrides(overrides):
+    # Accepts {"Exif": {...}} as well as flat {"DateTimeOriginal": ...}
+    nested = {}
+    for key, value in (overrides or {}).items():
+        if key in ("0th", "Exif", "GPS") and isinstance(value, dict):
+            nested.setdefault(key, {}).update(value)
+            continue
+        ifd_name, tag_name = _resolve_exif_name(key)
+        if ifd_name:
+            nested.setdefault(ifd_name, {})[tag_name] = value
+    return nested
+
+def _encode_exif_slot(tag_type, value):
+    # Raw big-endian bytes as piexif would write them
+    if tag_type in (2, 7) and not isinstance(value, (str, bytes, bytearray)):
+        raise TypeError(f"expected text or bytes, got {type(value).__name__}")
+    if tag_type == 2:
+        if isinstance(value, str):
+            # Same encoding _convert_exif_value uses for the non-batch path
+            value = value.encode("utf-8")
+        return bytes(value) + b"\x00"
+    return _encode_tiff_value(tag_type, value, ">")[2]
+
+def _locate_exif_slots(blob):
+    # Maps (ifd, tag) -> (entry position, value position) in a piexif.dump blob
+    tiff = 6  # after b"Exif\0\0"
+    slots = {}
+
+    def walk(ifd_name, offset):
+        (count,) = struct.unpack(">H", blob[tiff + offset:tiff + offset + 2])
+        for n in range(count):
+            entry = tiff + offset + 2 + 12 * n
+            tag, typ, cnt = struct.unpack(">HHL", blob[entry:entry + 8])
+            if ifd_name == "0th" and tag in _EXIF_IFD_POINTERS.values():
+                (sub_offset,) = struct.unpack(">L", blob[entry + 8:entry + 12])
+                walk("Exif" if tag == 34665 else "GPS", sub_offset)
+                continue
+            if _TIFF_TYPE_SIZES.get(typ, 0) * cnt > 4:
+                (value_offset,) = struct.unpack(">L", blob[entry + 8:entry + 12])
+                slots[(ifd_name, tag)] = (entry, tiff + value_offset)
+            else:
+                slots[(ifd_name, tag)] = (entry, entry + 8)
+
+    (first,) = struct.unpack(">L", blob[tiff + 4:tiff + 8])
+    walk("0th", first)
+    return slots
+
+def build_exif_batch(template, overrides):
+    """
+    Builds one EXIF blob per entry in overrides (name-keyed dicts, nested by IFD
+    or flat) on top of template (a preset-style EXIF JSON).
+    The layout is computed once; per-file values are patched into fixed-size slots.
+    Entries that don't fit the layout fall back to a full piexif.dump.
+    """
+    base = _build_exif_dict(template or {})
+    rows = []
+    variable = {}  # (ifd, tag_id) -> tag type
+    for row in overrides:
+        mapped = {}
+        for ifd_name, values in _nest_exif_overrides(row).items():
+            for tag_id, value in _map_exif_keys(ifd_name, values).items():
+                mapped[(ifd_name, tag_id)] = value
+                variable[(ifd_name, tag_id)] = piexif.TAGS[ifd_name][tag_id]["type"]
+        rows.append(mapped)
+
+    # Encode every variable value once and size the slots
+    encoded_rows = []
+    slot_sizes = {}
+    samples = {}
+    for mapped in rows:
+        encoded = {}
+        for key, tag_type in variable.items():
+            value = mapped.get(key, base[key[0]].get(key[1]))
+            if value is None:
+                continue
+            try:
+                raw = _encode_exif_slot(tag_type, value)
+            except Exception as e:
+                # Drop the bad value so the row (and its fallback dump) still succeeds
+                print(f"Warning: Failed to encode tag {key}: {e}")
+                mapped.pop(key, None)
+                continue
+            encoded[key] = raw
+            samples.setdefault(key, value)
+            if tag_type in (2, 7):  # variable length: reserve the longest value
+                slot_sizes[key] = max(slot_sizes.get(key, 0), len(raw))
+            else:
+                slot_sizes.setdefault(key, len(raw))
+        encoded_rows.append(encoded)
+
+    # Lay out the template with placeholders of the slot sizes
+    layout = {name: dict(tags) for name, tags in base.items() if isinstance(tags, dict)}
+    layout["thumbnail"] = None
+    for key, size in slot_sizes.items():
+        tag_type = variable[key]
+        if tag_type == 2:
+            layout[key[0]][key[1]] = b"\x00" * (size - 1)
+        elif tag_type == 7:
+            layout[key[0]][key[1]] = b"\x00" * size
+        else:
+            layout[key[0]][key[1]] = samples[key]
+    template_blob = piexif.dump(layout)
+    positions = _locate_exif_slots(template_blob)
+
+    blobs = []
+    for mapped, encoded in zip(rows, encoded_rows):
+        fits = len(encoded) == len(slot_sizes) and all(
+            len(raw) <= slot_sizes[key] if variable[key] in (2, 7) else len(raw) == slot_sizes[key]
+            for key, raw in encoded.items()
+        )
+        if not fits:
+            # Row doesn't fit the shared layout (missing field / different count)
+            exif_dict = {name: dict(tags) for name, tags in base.items() if isinstance(tags, dict)}
+            exif_dict["thumbnail"] = None
+            for (ifd_name, tag_id), value in mapped.items():
+                exif_dict[ifd_name][tag_id] = value
+            blobs.append(piexif.dump(exif_dict))
+            continue
+        blob = bytearray(template_blob)
+        for key, raw in encoded.items():
+            entry, pos = positions[key]
+            if variable[key] in (2, 7):
+                # Variable length: the count carries the real length, padding stays unused storage
+                blob[entry + 4:entry + 8] = struct.pack(">L", len(raw))
+                if len(raw) <= 4:
+                    pos = entry + 8
+                    raw = raw.ljust(4, b"\x00")
+            blob[pos:pos + len(raw)] = raw
+        blobs.append(bytes(blob))
+    return blobs
+
+def _manifest_tag_type(column):
+    ifd_name, tag_name = _resolve_exif_name(column)
+    if ifd_name not in ("0th", "Exif", "GPS"):
+        return None
+    name_to_id, tag_types = _exif_tag_index(ifd_name)
+    tag_id = name_to_id.get(tag_name)
+    return tag_types.get(tag_id) if tag_id is not None else None
+
+def parse_exif_manifest(text):
+    """
+    Parses a CSV manifest: an `id` column (the upload id) plus one column per EXIF tag
+    (e.g. DateTimeOriginal, ImageDescription, GPS.GPSLatitude). Cells holding JSON
+    (numbers, [[35,1],[40,1],[15,1]]) are decoded for non-text tags; empty cells are ignored.
+    Returns a list of (id, overrides) tuples.
+    """
+    entries = []
+    for row in csv.DictReader(io.StringIO(text)):
+        file_key = (row.pop("id", None) or "").strip()
+        if not file_key:
             continue
-        # Otherwise write length and payload
-        out.append(data[i])
-        out.append(data[i + 1])
-        out.extend(seg_payload)
-        i = seg_end
-    if sos_found:
-        with open(jpeg_path, "wb") as f:
-            f.write(out)
+        overrides = {}
+        for column, cell in row.items():
+            if column is None or cell is None or cell.strip() == "":
+                continue
+            column = column.strip()
+            value = cell
+            if _manifest_tag_type(column) not in (2, 7, None):
+                # Numeric / rational tags: decode JSON cells, text tags stay strings
+                try:
+                    decoded = json.loads(cell)
+                    if isinstance(decoded, (int, float, list)):
+                        value = decoded
+                except ValueError:
+                    pass
+            overrides[column] = value
+        entries.append((file_key, overrides))
+    return entries